@@ -365,8 +365,13 @@ class Corpus(object):
       # data from the encoded database.
       if not self._indices_arrays:
         with self.encoded.Session() as session:
-          query = session.query(encoded.EncodedContentFile)
-          self._indices_arrays = [x.indices_array for x in query]
+          # Select only the data column, rather than constructing a full ORM
+          # object for every encoded contentfile.
+          query = session.query(encoded.EncodedContentFile.data)
+          self._indices_arrays = [
+            encoded.EncodedContentFile.DataStringToNumpyArray(data)
+            for data, in query
+          ]
 
       if shuffle:
         random.shuffle(self._indices_arrays)
@@ -545,10 +550,10 @@ def ResolveContentId(
         print(content_id, file=f)
       app.Log(1, "Wrote directory hash: '%s'.", hash_file_path)
   elif config.HasField("local_tar_archive"):
-    # This if not an efficient means of getting the hash, as it requires always
-    # unpacking the archive and reading the entire contents. It would be nicer
-    # to maintain a cache which maps the mtime of tarballs to their content ID,
-    # similart to how local_directory is implemented.
+    # Computing the hash of an archive requires unpacking it and reading the
+    # entire contents. The result is cached in a file alongside the archive,
+    # similar to how local_directory is implemented, and is recomputed if the
+    # mtime or size of the archive changes.
     content_id = GetHashOfArchiveContents(
       ExpandConfigPath(
         config.local_tar_archive, path_prefix=FLAGS.clgen_local_path_prefix
@@ -599,6 +604,11 @@ def ResolveEncodedId(content_id: str, config: corpus_pb2.Corpus) -> str:
 def GetHashOfArchiveContents(archive: pathlib.Path) -> str:
   """Compute the checksum of the contents of a directory.
 
+  After the first time we compute the hash of an archive, we write it into a
+  file '<archive>.sha1.txt', along with the modification time and size of the
+  archive. Subsequent calls read the hash from this file, unless the archive
+  has since been modified.
+
   Args:
     archive: Path of the archive.
 
@@ -611,10 +621,30 @@ def GetHashOfArchiveContents(archive: pathlib.Path) -> str:
   if not archive.is_file():
     raise errors.UserError(f"Archive not found: '{archive}'")
 
+  # The hash file contains a single line: '<hash> <mtime_ns> <size>'.
+  stat = archive.stat()
+  archive_stamp = [str(stat.st_mtime_ns), str(stat.st_size)]
+  hash_file_path = pathlib.Path(str(archive) + ".sha1.txt")
+  if hash_file_path.is_file():
+    cached = hash_file_path.read_text().split()
+    if len(cached) == 3 and cached[1:] == archive_stamp:
+      app.Log(1, "Reading archive hash: '%s'.", hash_file_path)
+      return cached[0]
+
   with tempfile.TemporaryDirectory(prefix="clgen_corpus_") as d:
     cmd = ["tar", "-xf", str(archive), "-C", d]
     try:
       subprocess.check_call(cmd)
     except subprocess.CalledProcessError:
       raise errors.UserError(f"Archive unpack failed: '{archive}'")
-    return checksumdir.dirhash(d, "sha1")
+    content_id = checksumdir.dirhash(d, "sha1")
+
+  # The hash file is only a cache, so an archive in a read-only directory is
+  # not an error.
+  try:
+    with open(hash_file_path, "w") as f:
+      print(" ".join([content_id] + archive_stamp), file=f)
+    app.Log(1, "Wrote archive hash: '%s'.", hash_file_path)
+  except OSError as e:
+    app.Log(1, "Cannot write archive hash '%s': %s", hash_file_path, e)
+  return content_id
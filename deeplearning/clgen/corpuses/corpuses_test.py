@@ -14,8 +14,10 @@
 # along with clgen.  If not, see <https://www.gnu.org/licenses/>.
 """Unit tests for //deeplearning/clgen/corpuses:corpus."""
 import datetime
+import io
 import os
 import pathlib
+import tarfile
 import tempfile
 
 from deeplearning.clgen import errors
@@ -122,6 +124,37 @@ def test_Corpus_archive_hash(
   assert ABC_CORPUS_HASH == c.hash
 
 
+def test_GetHashOfArchiveContents_modified_archive(abc_corpus_archive):
+  """Test that the archive hash is recomputed when the archive changes."""
+  archive = pathlib.Path(abc_corpus_archive)
+  hash_1 = corpuses.GetHashOfArchiveContents(archive)
+  assert corpuses.GetHashOfArchiveContents(archive) == hash_1
+
+  with tarfile.open(archive, "w:bz2") as tar:
+    info = tarfile.TarInfo(name="corpus/a")
+    info.size = 3
+    tar.addfile(info, io.BytesIO(b"foo"))
+  # Set an explicit modification time so that the change is detected, even on
+  # file systems with coarse timestamp resolution.
+  os.utime(archive, (0, 0))
+  assert corpuses.GetHashOfArchiveContents(archive) != hash_1
+
+
+def test_GetHashOfArchiveContents_hash_file(abc_corpus_archive):
+  """Test that the archive hash is read from the hash file."""
+  archive = pathlib.Path(abc_corpus_archive)
+  hash_file_path = pathlib.Path(abc_corpus_archive + ".sha1.txt")
+  assert not hash_file_path.is_file()
+  corpuses.GetHashOfArchiveContents(archive)
+  assert hash_file_path.is_file()
+
+  # Replace the hash in the file. The archive is unmodified, so the hash file
+  # is trusted.
+  _, mtime_ns, size = hash_file_path.read_text().split()
+  hash_file_path.write_text(f"0123456789abcdef {mtime_ns} {size}\n")
+  assert corpuses.GetHashOfArchiveContents(archive) == "0123456789abcdef"
+
+
 def test_Corpus_archive_not_found(clgen_cache_dir, abc_corpus_config):
   """Test that UserError is raised if local_tar_archive does not exist."""
   del clgen_cache_dir
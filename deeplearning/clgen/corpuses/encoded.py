@@ -75,7 +75,9 @@ class EncodedContentFile(Base):
   @staticmethod
   def DataStringToNumpyArray(data: str) -> np.ndarray:
     """Convert the 'data' string to a numpy array."""
-    return np.array([int(x) for x in data.split(".")], dtype=np.int32)
+    # Parse the integers in numpy's C parser, rather than calling int() once
+    # per token.
+    return np.fromstring(data, dtype=np.int32, sep=".")
 
   @staticmethod
   def NumpyArrayToDataString(array: np.ndarray) -> str:
@@ -232,14 +234,19 @@ class EncodedContentFiles(sqlutil.Database):
           session.query(EncodedContentFile.id).all()
         ),
       )
+      # Serialize the atomizer once, rather than once per job.
+      pickled_atomizer = pickle.dumps(atomizer)
       jobs = [
         internal_pb2.EncoderWorker(
-          id=x.id,
-          text=x.text,
+          id=id_,
+          text=text,
           contentfile_separator=contentfile_separator,
-          pickled_atomizer=pickle.dumps(atomizer),
+          pickled_atomizer=pickled_atomizer,
+        )
+        for id_, text in query.with_entities(
+          preprocessed.PreprocessedContentFile.id,
+          preprocessed.PreprocessedContentFile.text,
         )
-        for x in query
       ]
       if not jobs:
         raise errors.EmptyCorpusException(
@@ -249,7 +256,7 @@ class EncodedContentFiles(sqlutil.Database):
       app.Log(
         1,
         "Encoding %s of %s preprocessed files",
-        humanize.Commas(query.count()),
+        humanize.Commas(len(jobs)),
         humanize.Commas(
           p_session.query(preprocessed.PreprocessedContentFile)
           .filter(
@@ -284,20 +291,25 @@ class EncodedContentFiles(sqlutil.Database):
       return {}
 
     vocab_size = int(q.one()[0])
-    q = session.query(Meta.value)
-    return {
-      q.filter(Meta.key == f"vocab_{i}").one()[0]: i for i in range(vocab_size)
-    }
+    # Read all of the vocabulary entries in a single query, rather than issuing
+    # one query per token.
+    entries = dict(
+      session.query(Meta.key, Meta.value).filter(Meta.key.like("vocab_%"))
+    )
+    return {entries[f"vocab_{i}"]: i for i in range(vocab_size)}
 
   @staticmethod
   def StoreVocabInMetaTable(
     session: sqlutil.Session, vocabulary: typing.Dict[str, int]
   ) -> None:
-    """Store a vocabulary dictionary in the 'Meta' table of a database."""
-    q = session.query(encoded.Meta).filter(encoded.Meta.key.like("vocab_%"))
+    """Store a vocabulary dictionary in the 'Meta' table of a database.
+
+    The rows are written as a single bulk insert within the session's
+    transaction. It is the responsibility of the caller to commit the session.
+    """
+    q = session.query(Meta).filter(Meta.key.like("vocab_%"))
     q.delete(synchronize_session=False)
 
-    session.add(encoded.Meta(key="vocab_size", value=str(len(vocabulary))))
-    session.add_all(
-      [encoded.Meta(key=f"vocab_{v}", value=k) for k, v in vocabulary.items()]
-    )
+    rows = [{"key": "vocab_size", "value": str(len(vocabulary))}]
+    rows += [{"key": f"vocab_{v}", "value": k} for k, v in vocabulary.items()]
+    session.bulk_insert_mappings(Meta, rows)
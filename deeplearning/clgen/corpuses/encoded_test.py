@@ -152,6 +152,61 @@ def test_EncodedContentFiles_token_count(
   assert 20 == temp_db.token_count
 
 
+def test_EncodedContentFiles_GetVocabFromMetaTable(
+  temp_db: encoded.EncodedContentFiles,
+):
+  """Test that vocabulary is read from meta table."""
+  with temp_db.Session(commit=True) as session:
+    session.add_all(
+      [
+        encoded.Meta(key="vocab_size", value="3"),
+        encoded.Meta(key="vocab_0", value="a"),
+        encoded.Meta(key="vocab_1", value="b"),
+        encoded.Meta(key="vocab_2", value="c"),
+      ]
+    )
+  with temp_db.Session() as session:
+    vocab = encoded.EncodedContentFiles.GetVocabFromMetaTable(session)
+  assert vocab == {"a": 0, "b": 1, "c": 2}
+
+
+def test_EncodedContentFiles_GetVocabFromMetaTable_empty(
+  temp_db: encoded.EncodedContentFiles,
+):
+  """Test that empty vocabulary is returned if meta table is empty."""
+  with temp_db.Session() as session:
+    assert encoded.EncodedContentFiles.GetVocabFromMetaTable(session) == {}
+
+
+def test_EncodedContentFiles_StoreVocabInMetaTable_round_trip(
+  temp_db: encoded.EncodedContentFiles,
+):
+  """Test that a stored vocabulary can be read back from meta table."""
+  with temp_db.Session(commit=True) as session:
+    encoded.EncodedContentFiles.StoreVocabInMetaTable(
+      session, {"a": 0, "b": 1, "c": 2}
+    )
+  with temp_db.Session() as session:
+    vocab = encoded.EncodedContentFiles.GetVocabFromMetaTable(session)
+  assert vocab == {"a": 0, "b": 1, "c": 2}
+
+
+def test_EncodedContentFiles_StoreVocabInMetaTable_overwrite(
+  temp_db: encoded.EncodedContentFiles,
+):
+  """Test that storing a vocabulary replaces the previous vocabulary."""
+  with temp_db.Session(commit=True) as session:
+    encoded.EncodedContentFiles.StoreVocabInMetaTable(
+      session, {"a": 0, "b": 1, "c": 2}
+    )
+  with temp_db.Session(commit=True) as session:
+    encoded.EncodedContentFiles.StoreVocabInMetaTable(session, {"d": 0})
+  with temp_db.Session() as session:
+    vocab = encoded.EncodedContentFiles.GetVocabFromMetaTable(session)
+    assert session.query(encoded.Meta).count() == 2
+  assert vocab == {"d": 0}
+
+
 def test_EncodedContentFiles_empty_preprocessed_db(
   temp_db: encoded.EncodedContentFiles,
   abc_atomizer: atomizers.AsciiCharacterAtomizer,
@@ -1,6 +1,7 @@
 """Export the preprocessed text of a database to files or compressed archives.
 
 """
+import concurrent.futures
 import io
 import pathlib
 import tarfile
@@ -95,32 +96,45 @@ def ExportPreprocessedFiles(
       preprocessed.PreprocessedContentFile.text,
     ).filter(preprocessed.PreprocessedContentFile.id.in_(ids_to_export))
 
-    # Read batches of this query in a parallel thread.
-    # query_batches = sqlutil.OffsetLimitBatchedQuery(query, batch_size=batch_size)
+    # Read batches of this query in a parallel thread. The results are streamed
+    # from a single cursor, rather than re-running the query with an increasing
+    # offset for every batch.
     query_batches = ppar.ThreadedIterator(
-      sqlutil.OffsetLimitBatchedQuery(query, batch_size=batch_size),
+      sqlutil.StreamedBatchedQuery(query, batch_size=batch_size),
       max_queue_size=5,
     )
 
-    for i, batch in enumerate(query_batches, start=1):
-      if archive_batches:
-        with tarfile.open(outdir / f"preprocessed_{i}.tar.bz2", "w:bz2") as tar:
-          for sha256, text in batch.rows:
-            info = tarfile.TarInfo(name=f"{sha256}{file_suffix}")
-            info.size = len(text)
-            tar.addfile(info, io.BytesIO(text.encode("utf-8")))
-      else:
-        for sha256, text in batch.rows:
-          fs.Write(outdir / f"{sha256}{file_suffix}", text.encode("utf-8"))
-
-      app.Log(
-        1,
-        "Exported pre-processed files %s..%s of %s (%.2f%%)",
-        humanize.Commas(batch.offset),
-        humanize.Commas(batch.offset + len(batch.rows)),
-        humanize.Commas(max_rows),
-        ((batch.offset + len(batch.rows)) / max_rows) * 100,
-      )
+    def WriteFile(row) -> None:
+      sha256, text = row
+      fs.Write(outdir / f"{sha256}{file_suffix}", text.encode("utf-8"))
+
+    # File writes release the GIL, so write the files of each batch using a
+    # pool of threads to keep multiple writes in flight.
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+      for i, batch in enumerate(query_batches, start=1):
+        if archive_batches:
+          with tarfile.open(
+            outdir / f"preprocessed_{i}.tar.bz2", "w:bz2"
+          ) as tar:
+            for sha256, text in batch.rows:
+              # Encode the text once. The size of the archive member is the
+              # number of encoded bytes, not the number of characters.
+              data = text.encode("utf-8")
+              info = tarfile.TarInfo(name=f"{sha256}{file_suffix}")
+              info.size = len(data)
+              tar.addfile(info, io.BytesIO(data))
+        else:
+          # Consume the results to propagate any errors from the writes.
+          list(pool.map(WriteFile, batch.rows))
+
+        app.Log(
+          1,
+          "Exported pre-processed files %s..%s of %s (%.2f%%)",
+          humanize.Commas(batch.offset),
+          humanize.Commas(batch.offset + len(batch.rows)),
+          humanize.Commas(max_rows),
+          ((batch.offset + len(batch.rows)) / max_rows) * 100,
+        )
 
 
 def Main():
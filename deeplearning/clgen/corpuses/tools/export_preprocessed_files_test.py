@@ -14,6 +14,7 @@
 # along with clgen.  If not, see <https://www.gnu.org/licenses/>.
 """Unit tests for //deeplearning/clgen/corpuses:preprocessed."""
 import pathlib
+import tarfile
 
 from deeplearning.clgen.corpuses import preprocessed
 from deeplearning.clgen.corpuses.tools import export_preprocessed_files
@@ -135,6 +136,67 @@ def test_ExportFiles_with_file_suffix(
   assert len(list((tempdir / "out").iterdir())) == 3
 
 
+def test_ExportFiles_with_multiple_batches(
+  preprocessed_db: preprocessed.PreprocessedContentFiles, tempdir: pathlib.Path
+):
+  export_preprocessed_files.ExportPreprocessedFiles(
+    preprocessed_db, tempdir / "out", batch_size=1
+  )
+  assert fs.Read(tempdir / "out" / "00000000.txt") == "Hello, world"
+  assert fs.Read(tempdir / "out" / "11111111.txt") == "Hello, foo"
+  assert fs.Read(tempdir / "out" / "22222222.txt") == "ERROR: failure"
+  assert len(list((tempdir / "out").iterdir())) == 3
+
+
+def test_ExportFiles_archive_batches_with_multiple_batches(
+  preprocessed_db: preprocessed.PreprocessedContentFiles, tempdir: pathlib.Path
+):
+  export_preprocessed_files.ExportPreprocessedFiles(
+    preprocessed_db, tempdir / "out", batch_size=2, archive_batches=True
+  )
+  # Three unique texts in batches of two produce a full and a partial batch.
+  assert sorted(p.name for p in (tempdir / "out").iterdir()) == [
+    "preprocessed_1.tar.bz2",
+    "preprocessed_2.tar.bz2",
+  ]
+  names = []
+  for i, num_members in [(1, 2), (2, 1)]:
+    with tarfile.open(tempdir / "out" / f"preprocessed_{i}.tar.bz2") as tar:
+      assert len(tar.getnames()) == num_members
+      names += tar.getnames()
+  assert sorted(names) == ["00000000.txt", "11111111.txt", "22222222.txt"]
+
+
+def test_ExportFiles_archive_batches_non_ascii_text(tempdir: pathlib.Path):
+  """Test that archived texts are not truncated by multi-byte characters."""
+  db = preprocessed.PreprocessedContentFiles(
+    f"sqlite:///{tempdir}/preprocessed.db"
+  )
+  with db.Session(commit=True) as session:
+    session.add(
+      preprocessed.PreprocessedContentFile(
+        input_relpath="a",
+        input_sha256="00000000",
+        input_charcount=10,
+        input_linecount=10,
+        sha256="00000000",
+        charcount=10,
+        linecount=1,
+        text="Hello, wörld ✓",
+        preprocessing_succeeded=True,
+        preprocess_time_ms=4,
+        wall_time_ms=4,
+      )
+    )
+
+  export_preprocessed_files.ExportPreprocessedFiles(
+    db, tempdir / "out", archive_batches=True
+  )
+  with tarfile.open(tempdir / "out" / "preprocessed_1.tar.bz2") as tar:
+    data = tar.extractfile("00000000.txt").read()
+  assert data.decode("utf-8") == "Hello, wörld ✓"
+
+
 def test_Main(
   preprocessed_db: preprocessed.PreprocessedContentFiles, tempdir: pathlib.Path
 ):
@@ -32,7 +32,7 @@ def _MinimumLineCount(text: str, min_line_count: int) -> str:
   Raises:
     NoCodeException: If src is less than min_line_count long.
   """
-  if len(text.strip().split("\n")) < min_line_count:
+  if text.strip().count("\n") + 1 < min_line_count:
     raise errors.NoCodeException
   return text
 
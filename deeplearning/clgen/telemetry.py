@@ -25,6 +25,8 @@ from labm8.py import pbutil
 
 FLAGS = app.FLAGS
 
+EPOCH_TELEMETRY_FILENAME_RE = re.compile(r"epoch_\d\d+_telemetry\.pbtxt")
+
 
 class TrainingLogger(object):
   """A TrainingLogger produces telemetry data of a CLgen model as it is trained.
@@ -76,5 +78,5 @@ class TrainingLogger(object):
     return [
       pbutil.FromFile(self.logdir / p, telemetry_pb2.ModelEpochTelemetry())
       for p in sorted(self.logdir.iterdir())
-      if re.match(r"epoch_\d\d+_telemetry\.pbtxt", str(p.name))
+      if EPOCH_TELEMETRY_FILENAME_RE.match(p.name)
     ]
@@ -24,6 +24,9 @@ from labm8.py import crypto
 from labm8.py import fs
 from labm8.py import io
 
+# Runs of characters which are not valid in cache paths.
+ESCAPE_PATH_RE = re.compile(r"[ \\/]+")
+
 
 # TODO(cec): Remove type hints on base Cache, place them on FSCache.
 class Cache(object):
@@ -222,7 +225,7 @@ def escape_path(key):
   """
   Convert a key to a filename by escaping invalid characters.
   """
-  return re.sub(r"[ \\/]+", "_", key)
+  return ESCAPE_PATH_RE.sub("_", key)
 
 
 class FSCache(Cache):
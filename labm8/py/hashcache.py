@@ -17,8 +17,9 @@ Checksums files and directories and cache results. If a file or directory has
 not been modified, subsequent hashes are cache hits. Hashes are recomputed
 lazily, when a directory (or any of its subdirectories) have been modified.
 """
-import os
+import errno
 import pathlib
+import stat
 import subprocess
 import time
 import typing
@@ -148,9 +149,19 @@ class HashCache(sqlutil.Database):
     Raises:
       FileNotFoundError: If the requested path does not exist.
     """
-    if path.is_file():
-      return self._HashFile(path)
-    elif path.is_dir():
+    # Stat the path once and use the result both to determine the type of the
+    # path and, for files, the modification time.
+    try:
+      path_stat = path.stat()
+    except OSError as e:
+      # Missing paths, paths through a non-directory, and symlink loops are
+      # all reported as not found, like Path.is_file() and Path.is_dir().
+      if e.errno not in (errno.ENOENT, errno.ENOTDIR, errno.ELOOP):
+        raise
+      raise FileNotFoundError(f"File not found: '{path}'") from None
+    if stat.S_ISREG(path_stat.st_mode):
+      return self._HashFile(path, int(path_stat.st_mtime))
+    elif stat.S_ISDIR(path_stat.st_mode):
       return self._HashDirectory(path)
     else:
       raise FileNotFoundError(f"File not found: '{path}'")
@@ -178,11 +189,9 @@ class HashCache(sqlutil.Database):
       lambda x: checksumdir.dirhash(x, self.hash_fn_name),
     )
 
-  def _HashFile(self, absolute_path: pathlib.Path) -> str:
+  def _HashFile(self, absolute_path: pathlib.Path, last_modified: int) -> str:
     return self._InMemoryWrapper(
-      absolute_path,
-      lambda path: int(os.path.getmtime(path)),
-      self.hash_fn_file,
+      absolute_path, lambda path: last_modified, self.hash_fn_file,
     )
 
   def _InMemoryWrapper(
@@ -221,7 +230,6 @@ class HashCache(sqlutil.Database):
         return cached_entry.hash
       elif cached_entry:
         app.Log(2, "Cache miss: '%s'", absolute_path)
-        session.delete(cached_entry)
       start_time = time.time()
       checksum = hash_fn(absolute_path)
       app.Log(
@@ -230,11 +238,18 @@ class HashCache(sqlutil.Database):
         absolute_path,
         humanize.Commas(int((time.time() - start_time) * 1000)),
       )
-      new_entry = HashCacheRecord(
-        absolute_path=str(absolute_path),
-        last_modified=last_modified,
-        hash=checksum,
-      )
-      session.add(new_entry)
+      if cached_entry:
+        # Update the stale entry in place. This is a single UPDATE statement,
+        # rather than a DELETE followed by an INSERT of the same key.
+        cached_entry.last_modified = last_modified
+        cached_entry.hash = checksum
+      else:
+        session.add(
+          HashCacheRecord(
+            absolute_path=str(absolute_path),
+            last_modified=last_modified,
+            hash=checksum,
+          )
+        )
       session.commit()
-      return new_entry.hash
+      return checksum
@@ -0,0 +1,206 @@
+# Copyright 2014-2020 Chris Cummins <chrisc.101@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for //labm8/py:sqlutil."""
+import pathlib
+import sqlite3
+import tempfile
+
+import sqlalchemy as sql
+from sqlalchemy.ext import declarative
+
+from labm8.py import sqlutil
+from labm8.py import test
+
+FLAGS = test.FLAGS
+
+Base = declarative.declarative_base()
+
+
+class Table(Base):
+  """A table for testing."""
+
+  __tablename__ = "table"
+  id: int = sql.Column(sql.Integer, primary_key=True)
+
+
+@test.Fixture(scope="function")
+def enable_sqlite_wal() -> None:
+  """A test fixture which enables --sqlite_enable_wal."""
+  sqlite_enable_wal = FLAGS.sqlite_enable_wal
+  FLAGS.sqlite_enable_wal = True
+  yield
+  FLAGS.sqlite_enable_wal = sqlite_enable_wal
+
+
+@test.Fixture(scope="function")
+def db(tempdir: pathlib.Path) -> sqlutil.Database:
+  """A test fixture which returns a database with five rows."""
+  db = sqlutil.Database(f"sqlite:///{tempdir}/db", Base)
+  with db.Session(commit=True) as session:
+    session.add_all([Table(id=i) for i in range(5)])
+  yield db
+
+
+@test.Fixture(scope="function")
+def wal_db(enable_sqlite_wal, db: sqlutil.Database) -> sqlutil.Database:
+  """A test fixture which returns a WAL-mode database with five rows."""
+  yield db
+
+
+# CreateEngine() tests.
+
+
+def test_CreateEngine_sqlite_journal_mode_default(tempdir: pathlib.Path):
+  """Test that the journal mode is not changed by default."""
+  engine = sqlutil.CreateEngine(f"sqlite:///{tempdir}/db")
+  assert engine.execute("PRAGMA journal_mode").scalar() == "delete"
+
+
+def test_CreateEngine_sqlite_journal_mode_wal(
+  enable_sqlite_wal, tempdir: pathlib.Path
+):
+  """Test that --sqlite_enable_wal enables write-ahead logging."""
+  engine = sqlutil.CreateEngine(f"sqlite:///{tempdir}/db")
+  assert engine.execute("PRAGMA journal_mode").scalar() == "wal"
+
+
+def test_CreateEngine_sqlite_must_exist_journal_mode_unchanged(
+  enable_sqlite_wal, tempdir: pathlib.Path
+):
+  """Test that opening an existing database does not modify the file."""
+  path = tempdir / "db"
+  connection = sqlite3.connect(str(path))
+  connection.execute("CREATE TABLE t (id INTEGER)")
+  connection.close()
+  contents = path.read_bytes()
+
+  engine = sqlutil.CreateEngine(f"sqlite:///{path}", must_exist=True)
+  assert engine.execute("PRAGMA journal_mode").scalar() == "delete"
+  engine.dispose()
+  assert path.read_bytes() == contents
+
+
+def test_CreateEngine_sqlite_cache_size(tempdir: pathlib.Path):
+  """Test that SQLite connections use the configured page cache size."""
+  engine = sqlutil.CreateEngine(f"sqlite:///{tempdir}/db")
+  assert engine.execute("PRAGMA cache_size").scalar() == (
+    -FLAGS.sqlite_cache_size_kib
+  )
+
+
+def test_CreateEngine_sqlite_connection_pool_overflow(tempdir: pathlib.Path):
+  """Test that holding many connections does not exhaust the pool."""
+  engine = sqlutil.CreateEngine(f"sqlite:///{tempdir}/db")
+  connections = [engine.connect() for _ in range(20)]
+  assert all(c.execute("SELECT 1").scalar() == 1 for c in connections)
+  for connection in connections:
+    connection.close()
+
+
+# StreamedBatchedQuery() tests.
+
+
+def test_StreamedBatchedQuery_batches(db: sqlutil.Database):
+  """Test the bookkeeping of batches, including a final partial batch."""
+  with db.Session() as session:
+    query = session.query(Table.id).order_by(Table.id)
+    batches = list(sqlutil.StreamedBatchedQuery(query, batch_size=2))
+
+  assert [b.batch_num for b in batches] == [1, 2, 3]
+  assert [b.offset for b in batches] == [0, 2, 4]
+  assert [b.limit for b in batches] == [2, 4, 6]
+  assert [len(b.rows) for b in batches] == [2, 2, 1]
+  assert [r.id for b in batches for r in b.rows] == [0, 1, 2, 3, 4]
+  assert all(b.max_rows is None for b in batches)
+
+
+def test_StreamedBatchedQuery_compute_max_rows(db: sqlutil.Database):
+  """Test that max_rows is set on every batch."""
+  with db.Session() as session:
+    query = session.query(Table.id)
+    batches = list(
+      sqlutil.StreamedBatchedQuery(query, batch_size=2, compute_max_rows=True)
+    )
+
+  assert [b.max_rows for b in batches] == [5, 5, 5]
+
+
+def test_StreamedBatchedQuery_empty_query(db: sqlutil.Database):
+  """Test that a query with no results produces no batches."""
+  with db.Session() as session:
+    query = session.query(Table.id).filter(Table.id > 10)
+    assert not list(sqlutil.StreamedBatchedQuery(query, batch_size=2))
+
+
+# SnapshotSqliteDatabase() tests.
+
+
+def test_SnapshotSqliteDatabase_immutable_read(
+  wal_db: sqlutil.Database, tempdir: pathlib.Path
+):
+  """Test that a snapshot of a WAL-mode database can be read immutably."""
+  with wal_db.Session() as session:
+    assert session.execute("PRAGMA journal_mode").scalar() == "wal"
+
+  snapshot_path = sqlutil.SnapshotSqliteDatabase(
+    wal_db.url, snapshot_path=tempdir / "snapshot.db"
+  )
+  assert snapshot_path == tempdir / "snapshot.db"
+
+  connection = sqlite3.connect(
+    f"file:{snapshot_path}?mode=ro&immutable=1", uri=True
+  )
+  try:
+    rows = connection.execute('SELECT id FROM "table" ORDER BY id').fetchall()
+  finally:
+    connection.close()
+  assert rows == [(0,), (1,), (2,), (3,), (4,)]
+
+
+def test_SnapshotSqliteDatabase_temporary_file(db: sqlutil.Database):
+  """Test that a temporary file is created if no path is given."""
+  snapshot_path = sqlutil.SnapshotSqliteDatabase(db.url)
+  try:
+    assert snapshot_path.is_file()
+    assert snapshot_path != pathlib.Path(db.url[len("sqlite:///") :])
+  finally:
+    snapshot_path.unlink()
+
+
+def test_SnapshotSqliteDatabase_in_memory_database():
+  """Test that in-memory databases cannot be snapshotted."""
+  with test.Raises(ValueError):
+    sqlutil.SnapshotSqliteDatabase("sqlite://")
+
+
+def test_SnapshotSqliteDatabase_not_found(tempdir: pathlib.Path):
+  """Test that an error is raised if the database does not exist."""
+  with test.Raises(sqlutil.DatabaseNotFound):
+    sqlutil.SnapshotSqliteDatabase(f"sqlite:///{tempdir}/missing.db")
+
+
+def test_SnapshotSqliteDatabase_failed_snapshot_removes_temporary_file(
+  tempdir: pathlib.Path, tempdir2: pathlib.Path, monkeypatch
+):
+  """Test that a failed snapshot does not leak a temporary file."""
+  monkeypatch.setattr(tempfile, "tempdir", str(tempdir2))
+  path = tempdir / "not_a_database.db"
+  path.write_bytes(b"This is not an SQLite database" * 100)
+  with test.Raises(sqlite3.DatabaseError):
+    sqlutil.SnapshotSqliteDatabase(f"sqlite:///{path}")
+  assert not list(tempdir2.iterdir())
+
+
+if __name__ == "__main__":
+  test.Main()